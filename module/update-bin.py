@@ -7,11 +7,12 @@ ensuring the correct binaries are available in the module's bin directory.
 """
 
 import logging
+import os
 from collections.abc import Generator
-from os import environ
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-HOME = environ["HOME"]
+HOME = os.environ["HOME"]
 
 MODULE_BIN = Path("system/bin")
 
@@ -23,6 +24,11 @@ WRAPPER_TEMPLATE = """
 . "{home}/env.sh" && exec {prog} "$@"
 """.strip()
 
+# WRAPPER_TEMPLATE with HOME filled in, split around the program name.
+WRAPPER_PREFIX, WRAPPER_SUFFIX = (
+    part.encode() for part in WRAPPER_TEMPLATE.replace("{home}", HOME).split("{prog}")
+)
+
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +38,7 @@ def iter_env_path() -> Generator[Path, None, None]:
 
     Only yields directories that are part of the Py2Droid's home directory.
     """
-    env_path = environ["PATH"]
+    env_path = os.environ["PATH"]
 
     for entry in (entry for entry in env_path.split(":") if HOME in entry):
         path = Path(entry)
@@ -42,8 +48,14 @@ def iter_env_path() -> Generator[Path, None, None]:
 
 def create_wrapper(path: Path) -> None:
     """Create a shell wrapper script at the specified path."""
-    path.write_text(WRAPPER_TEMPLATE.format(home=HOME, prog=path.name))
-    path.chmod(PERMISSIONS_MODE)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, PERMISSIONS_MODE)
+    try:
+        os.write(fd, WRAPPER_PREFIX + os.fsencode(path.name) + WRAPPER_SUFFIX)
+        # The creation mode is subject to the umask, so enforce it explicitly.
+        os.fchmod(fd, PERMISSIONS_MODE)
+    finally:
+        os.close(fd)
+
     logger.info("Created: %s", path.name)
 
 
@@ -55,25 +67,32 @@ def remove_wrapper(path: Path) -> None:
 
 def sync_wrappers() -> None:
     """Synchronize binary wrapper scripts in the MODULE_BIN directory."""
-    existing_wrappers = {
-        file.name: file for file in MODULE_BIN.iterdir() if file.is_file()
-    }
+    # scandir() entries cache the file type, saving a stat() per file on
+    # platforms that report it (d_type).
+    with os.scandir(MODULE_BIN) as it:
+        existing_wrappers = {
+            entry.name: Path(entry.path) for entry in it if entry.is_file()
+        }
 
     available_executables: set[str] = set()
 
-    for entry in iter_env_path():
-        available_executables.update(
-            file.name for file in entry.iterdir() if file.is_file()
+    for path in iter_env_path():
+        with os.scandir(path) as it:
+            available_executables.update(entry.name for entry in it if entry.is_file())
+
+    to_create = available_executables - existing_wrappers.keys()
+    to_remove = existing_wrappers.keys() - available_executables
+
+    # File operations release the GIL, so wrappers are synced concurrently.
+    with ThreadPoolExecutor() as executor:
+        list(executor.map(create_wrapper, (MODULE_BIN / name for name in to_create)))
+        list(
+            executor.map(
+                remove_wrapper,
+                (existing_wrappers[name] for name in to_remove),
+            ),
         )
 
-    for name in available_executables:
-        if name not in existing_wrappers:
-            create_wrapper(MODULE_BIN / name)
-
-    for name, path in existing_wrappers.items():
-        if name not in available_executables:
-            remove_wrapper(path)
-
 
 def main() -> None:
     """Synchronize shell wrappers for Py2Droid binaries."""
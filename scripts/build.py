@@ -8,10 +8,11 @@ into a flashable Magisk zip file.
 Requires:
   - Python 3.12+
   - wcmatch
-  - External tools: curl, patch
+  - External tools: curl, patch, tar, xz
 """
 
-import io
+import hashlib
+import json
 import logging
 import os
 import re
@@ -20,16 +21,18 @@ import shutil
 import subprocess
 import sys
 import tarfile
-from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
-from collections.abc import Sequence
-from dataclasses import dataclass
-from itertools import chain
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, ArgumentTypeError
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from itertools import batched, chain
 from string import Template
-from subprocess import CalledProcessError, CompletedProcess
+from subprocess import DEVNULL, PIPE, STDOUT, CalledProcessError, CompletedProcess
 from typing import Any, ClassVar
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
 import tomllib
+from wcmatch import glob
 from wcmatch.glob import BRACE, EXTGLOB, GLOBSTARLONG, NEGATE
 from wcmatch.pathlib import Path
 
@@ -44,12 +47,22 @@ BUILD_DIR = Path("build")
 DIST_DIR = Path("dist")
 MODULE_DIR = Path("module")
 PATCHES_DIR = Path("patches")
+SOURCE_CACHE_DIR = BUILD_DIR / "source-cache"
+STAMPS_DIR = BUILD_DIR / ".stamps"
 
-REQUIRED_TOOLS = ("curl", "patch")
+REQUIRED_TOOLS = ("curl", "patch", "tar", "xz")
 
 # Used for a simple heuristic to detect binary files.
 # From: https://stackoverflow.com/questions/898669/how-can-i-detect-if-a-file-is-binary-non-text-in-python
-TEXT_CHARS = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+TEXT_CHARS = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+# Binary files give themselves away early (e.g. the ELF header), so only the
+# beginning of the data is checked.
+BINARY_CHECK_SIZE = 512
+
+# Magic numbers of files that llvm-strip can process.
+ELF_MAGIC = b"\x7fELF"
+AR_MAGIC = b"!<arch>\n"
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +80,8 @@ class CPythonConfig:
     configure_args: list[str]
     configure_env: dict[str, str]
     version: str
+    # Number of hosts to build concurrently, None to derive it from the CPU count.
+    jobs: int | None = None
 
 
 @dataclass(slots=True, frozen=True, eq=False)
@@ -96,6 +111,56 @@ class CPythonBuildResult:
     used_ndk_toolchain: Path
 
 
+class Downloader:
+    """Queue downloads and fetch them all with a single curl process.
+
+    Passing every URL to one curl lets it reuse connections and TLS sessions
+    between downloads, and fetch them in parallel where supported.
+    """
+
+    # Without --parallel, curl's exit code only reflects the last transfer, so
+    # --fail-early is needed for an earlier failed download to be noticed.
+    curl_args = ("-Lf", "--fail-early", "--retry", "5", "--retry-all-errors")
+
+    # Maximum number of concurrent transfers with --parallel.
+    parallel_max = 8
+
+    def __init__(self) -> None:
+        """Initialize an empty download queue."""
+        self.queue: list[tuple[Path, str]] = []
+
+    def add(self, path: Path, url: str) -> None:
+        """Queue a download, unless the file already exists."""
+        if path.exists():
+            logger.info("Skipping download (file already exists): %s", path)
+            return
+
+        self.queue.append((path, url))
+
+    def flush(self) -> None:
+        """Download all queued files and clear the queue."""
+        if not self.queue:
+            return
+
+        # The URLs are passed as a curl config on stdin rather than as
+        # arguments, which keeps the command line short however many there are.
+        config = "".join(
+            f"url = {curl_quote(url)}\noutput = {curl_quote(str(path))}\n"
+            for path, url in self.queue
+        )
+
+        parallel: tuple[str, ...] = ()
+        if len(self.queue) > 1 and _curl_supports_parallel():
+            parallel = ("--parallel", "--parallel-max", str(self.parallel_max))
+
+        for path, url in self.queue:
+            logger.info("Downloading %s to: %s", url, path)
+
+        run("curl", *self.curl_args, *parallel, "-K", "-", input=config, text=True)
+
+        self.queue.clear()
+
+
 class CPythonBuilder:
     """Handle the download, patching, and compilation of CPython for Android."""
 
@@ -108,11 +173,11 @@ class CPythonBuilder:
     def build(self) -> CPythonBuildResult:
         """Execute the entire CPython build pipeline.
 
-        This method downloads the source code, applies patches, configures the
-        environment, and runs the build for all specified hosts.
+        This method extracts the source code, applies patches, configures the
+        environment, and runs the build for all specified hosts. The source
+        tarball must already be downloaded (see source_tarball).
         """
-        source_tarball = self._download()
-        source_dir = self._extract(source_tarball)
+        source_dir = self._extract(self.source_tarball[0])
 
         if self.config.apply_patches:
             self._apply_patches(source_dir)
@@ -120,77 +185,101 @@ class CPythonBuilder:
         toolchain = self._find_ndk_toolchain(source_dir)
         build_env = self._create_env(toolchain)
 
-        self._build_hosts(source_dir, build_env)
+        self._build_hosts(source_dir, toolchain, build_env)
 
         return CPythonBuildResult(source_dir, toolchain)
 
-    def _download(self) -> Path:
-        """Download the CPython source tarball for the configured version.
+    @property
+    def source_tarball(self) -> tuple[Path, str]:
+        """Return the local path and URL of the CPython source tarball.
 
-        If the tarball already exists in the build directory, the download is
-        skipped.
+        The tarball is kept in SOURCE_CACHE_DIR, so it survives --clean.
         """
         tarball_name = f"v{self.config.version}.tar.gz"
 
-        tarball_path = BUILD_DIR / tarball_name
+        return SOURCE_CACHE_DIR / tarball_name, self.source_archive_url + tarball_name
+
+    @staticmethod
+    def _extract(source_tarball: Path) -> Path:
+        """Extract a CPython source tarball.
+
+        The pristine source tree is kept in SOURCE_CACHE_DIR and copied into the
+        build directory, so rebuilds after --clean don't extract it again.
+        """
+        # Only the first header is read here, unlike getnames() which
+        # decompresses the whole archive.
+        with tarfile.open(source_tarball) as tar:
+            first_member = tar.next()
+
+        if first_member is None:
+            error_msg = f"Source tarball is empty: {source_tarball}"
+            raise BuilderError(error_msg)
+
+        source_name = first_member.name.partition("/")[0]
+        source_dir = BUILD_DIR / source_name
 
-        if tarball_path.exists():
+        if source_dir.exists():
             logger.info(
-                "Skipping download (source tarball already exists): %s",
-                tarball_path,
+                "Skipping extraction (source directory already exists): %s",
+                source_dir,
             )
-            return tarball_path
-
-        run(
-            "curl",
-            "-Lf",
-            "--retry",
-            "5",
-            "--retry-all-errors",
-            "-o",
-            tarball_path,
-            self.source_archive_url + tarball_name,
-        )
+            return source_dir
 
-        return tarball_path
+        cache_dir = SOURCE_CACHE_DIR / source_name
 
-    @staticmethod
-    def _extract(source_tarball: Path) -> Path:
-        """Extract a CPython source tarball."""
-        with tarfile.open(source_tarball) as tar:
-            source_dir = BUILD_DIR / tar.getnames()[0]
+        if not cache_dir.exists():
+            # Extract next to the cache first, so that an interrupted
+            # extraction never leaves a partial tree in the cache.
+            partial_dir = SOURCE_CACHE_DIR / ".partial"
+            if partial_dir.exists():
+                shutil.rmtree(partial_dir)
+            partial_dir.mkdir()
 
-            if source_dir.exists():
-                logger.info(
-                    "Skipping extraction (source directory already exists): %s",
-                    source_dir,
-                )
-                return source_dir
+            # System tar is much faster than the pure-Python tarfile module.
+            run("tar", "-xf", source_tarball, "-C", partial_dir)
+            (partial_dir / source_name).rename(cache_dir)
+            partial_dir.rmdir()
 
-            tar.extractall(BUILD_DIR, filter="fully_trusted")
+        logger.info("Copying cached source %s to %s...", cache_dir, source_dir)
+        copy_tree(cache_dir, source_dir)
 
         return source_dir
 
     @staticmethod
     def _apply_patches(source_dir: Path) -> None:
-        """Apply all patches from the patches/ directory to the source code."""
+        """Apply all patches from the patches/ directory to the source code.
+
+        Patches are applied concurrently when no two of them touch the same
+        file, and one after another otherwise.
+        """
         logger.info("Applying patches to %s...", source_dir)
 
-        for patch in PATCHES_DIR.glob("*.patch"):
-            if patch.is_file():
-                result = run(
-                    "patch",
-                    "-Np1",
-                    "-sr",
-                    "-",
-                    "-i",
-                    "../../" / patch,
-                    capture_output=True,
-                    check=False,
-                    cwd=source_dir,
-                    text=True,
-                )
+        patches = [patch for patch in PATCHES_DIR.glob("*.patch") if patch.is_file()]
+        if not patches:
+            return
 
+        patched = [get_patched_files(patch) for patch in patches]
+        disjoint = sum(map(len, patched)) == len(set().union(*patched))
+        workers = min(8, os.cpu_count() or 1) if disjoint else 1
+
+        def apply(patch: Path) -> CompletedProcess:
+            return run(
+                "patch",
+                "-Np1",
+                "-sr",
+                "-",
+                "-i",
+                "../../" / patch,
+                capture_output=True,
+                check=False,
+                cwd=source_dir,
+                text=True,
+            )
+
+        with ThreadPoolExecutor(workers) as executor:
+            # Results come back in submission order, so errors are reported
+            # for the same patch as with a sequential run.
+            for result in executor.map(apply, patches):
                 sys.stdout.write(result.stdout)
 
                 if result.returncode == 0:
@@ -253,7 +342,12 @@ class CPythonBuilder:
 
         return env
 
-    def _build_hosts(self, source_dir: Path, env: dict[str, str]) -> None:
+    def _build_hosts(
+        self,
+        source_dir: Path,
+        toolchain: Path,
+        env: dict[str, str],
+    ) -> None:
         """Run the CPython for Android build process for all target hosts.
 
         This method automates the execution of the Android/android.py script
@@ -268,21 +362,101 @@ class CPythonBuilder:
         else:
             logger.info("Skipping initial setup (build artifacts found).")
 
+        pending_hosts: list[str] = []
         for host in self.config.build_hosts:
-            if (source_dir / "cross-build" / host / "prefix").exists():
+            if (cross_build / host / "prefix").exists():
                 logger.info("Skipping host %s (build artifacts found).", host)
                 continue
 
+            pending_hosts.append(host)
+
+        if not pending_hosts:
+            return
+
+        # android.py already runs make with -j$(nproc) for each host, so by
+        # default only build as many hosts at once as the CPU count allows.
+        jobs = self.config.jobs or max(1, (os.cpu_count() or 1) // len(pending_hosts))
+
+        workers = min(jobs, len(pending_hosts))
+
+        # Split the CPUs between concurrently built hosts for any make or CMake
+        # invocation that doesn't pass its own -j.
+        make_jobs = str(max(1, (os.cpu_count() or 1) // workers))
+        env = env.copy()
+        env.setdefault("MAKEFLAGS", f"-j{make_jobs}")
+        env.setdefault("CMAKE_BUILD_PARALLEL_LEVEL", make_jobs)
+
+        if workers == 1:
+            for host in pending_hosts:
+                self._build_host(android, host, env)
+            return
+
+        # android-env.sh installs the NDK if it's missing. Do that once up front,
+        # so that concurrent hosts don't race to install it into the same place.
+        if not toolchain.exists():
             run(
+                "./android.py",
+                "env",
+                pending_hosts[0],
+                env=env,
+                cwd=android,
+                stdout=DEVNULL,
+            )
+
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(self._build_host, android, host, env, capture=True)
+                for host in pending_hosts
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Don't start any more hosts. The ones already running can't be
+                # interrupted, so the error is raised once they are done.
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    def _build_host(
+        self,
+        android: Path,
+        host: str,
+        env: dict[str, str],
+        *,
+        capture: bool = False,
+    ) -> None:
+        """Configure and build CPython for a single host.
+
+        With capture set, the output of android.py is written at once when the
+        host is done, so that concurrently built hosts don't interleave their
+        logs. Otherwise it is streamed as usual.
+        """
+        kwargs: dict[str, Any] = {"env": env, "cwd": android}
+        if capture:
+            kwargs.update(stdout=PIPE, stderr=STDOUT)
+
+        output = bytearray()
+
+        try:
+            result = run(
                 "./android.py",
                 "configure-host",
                 host,
                 "--",
                 *self.config.configure_args,
-                env=env,
-                cwd=android,
+                **kwargs,
             )
-            run("./android.py", "make-host", host, cwd=android)
+            output += result.stdout or b""
+
+            result = run("./android.py", "make-host", host, **kwargs)
+            output += result.stdout or b""
+        except CalledProcessError as e:
+            output += e.stdout or b""
+            raise
+        finally:
+            if output:
+                sys.stdout.buffer.write(output)
+                sys.stdout.buffer.flush()
 
 
 class ModuleBuilder:
@@ -310,16 +484,24 @@ class ModuleBuilder:
     # Will be formatted with the Magisk-converted architecture.
     compressed_name = "cpython-{}.tar.xz"
 
+    # Local path and URL of the CA bundle to include in the module.
+    cacert: ClassVar[tuple[Path, str]] = (
+        BUILD_DIR / "cacert.pem",
+        "https://curl.se/ca/cacert.pem",
+    )
+
+    # Number of files passed to a single llvm-strip invocation.
+    strip_batch_size = 64
+
     debloat_flags = GLOBSTARLONG | NEGATE | EXTGLOB | BRACE
 
     # Used for finding and replacing shebangs.
+    # The interpreter group decides which of the shebangs below is used.
     python_shebang = b"#!/system/bin/python3\n"
-    python_shebang_re = re.compile(
-        rb"^#!\s*/(?:usr/(?:local/)?|)(?:bin|sbin)/(?:env\s+)?python[0-9]*(?:\.[0-9]+)*",
-    )
     shell_shebang = b"#!/system/bin/sh\n"
-    shell_shebang_re = re.compile(
-        rb"^#!\s*/(?:usr/(?:local/)?|)(?:bin|sbin)/(?:env\s+)?(?:sh|bash|dash)",
+    shebang_re = re.compile(
+        rb"^#!\s*/(?:usr/(?:local/)?|)(?:bin|sbin)/(?:env\s+)?"
+        rb"(python[0-9]*(?:\.[0-9]+)*|sh|bash|dash)",
     )
 
     def __init__(
@@ -336,101 +518,185 @@ class ModuleBuilder:
 
         self.description = self.description.format(cpython_version)
 
+        # Debloat patterns are compiled once and matched against every path
+        # during a single walk of the prefix, instead of globbing per pattern.
+        patterns: list[str] = []
+        self.conditional_debloat_matchers = []
+
+        for pattern in config.debloat_patterns:
+            if isinstance(pattern, str):
+                patterns.append(pattern)
+                continue
+
+            matcher = glob.compile(pattern["pattern"], flags=self.debloat_flags)
+            rm_if = set(map(str.lower, pattern["rm_if"]))
+            self.conditional_debloat_matchers.append((matcher, rm_if))
+
+        self.debloat_matcher = glob.compile(patterns, flags=self.debloat_flags)
+
     def build(self, source_code: Path) -> None:
         """Execute the module packaging pipeline.
 
         This method processes the build artifacts for each host, compresses them,
-        and then builds the final Magisk module ZIP.
+        and then builds the final Magisk module ZIP. The CA bundle must already
+        be downloaded (see cacert).
         """
-        self._download_and_include_cacert()
-
-        tarballs = []
-        for host in self.hosts:
-            prefix = source_code / "cross-build" / host / "prefix"
+        self._include_cacert()
 
-            if self.config.debloat:
-                self._debloat(prefix)
-            if self.config.fix_shebangs:
-                self._fix_shebangs(prefix)
-            if self.config.strip:
-                self._strip(prefix)
-
-            tarball = self._compress(prefix, host)
-            tarballs.append(tarball)
+        # max(1, ...) keeps a config without build hosts valid, which packages
+        # the module without any prefix tarballs.
+        with ThreadPoolExecutor(max(1, len(self.hosts))) as executor:
+            futures = [
+                executor.submit(self._process_host, source_code, host)
+                for host in self.hosts
+            ]
+            tarballs = [future.result() for future in futures]
 
         self._package_module(tarballs)
 
-    def _download_and_include_cacert(self) -> None:
-        """Download the cacert.pem file and include it in the module.
+    def _process_host(self, source_code: Path, host: str) -> Path:
+        """Post-process and compress the prefix of a single host.
 
-        Python doesn't see system CA certificates (e.g. from
-        /system/etc/security/cacerts), so we should provide our own CA bundle
-        for SSL verification.
+        Returns the path to the compressed prefix.
         """
-        cacert_path = BUILD_DIR / "cacert.pem"
+        prefix = source_code / "cross-build" / host / "prefix"
 
-        if cacert_path.exists():
-            logger.info(
-                "Skipping download (cacert.pem already exists): %s",
-                cacert_path,
+        if self.config.debloat:
+            self._run_phase(
+                host,
+                prefix,
+                self._debloat,
+                self.config.debloat_patterns,
             )
-            self.config.include.append(cacert_path)
+        if self.config.fix_shebangs:
+            self._run_phase(
+                host,
+                prefix,
+                self._fix_shebangs,
+                self.python_shebang,
+                self.shell_shebang,
+            )
+        if self.config.strip:
+            self._run_phase(
+                host,
+                prefix,
+                self._strip,
+                self.config.strip_args,
+                self.toolchain,
+            )
+
+        return self._compress(prefix, host)
+
+    @staticmethod
+    def _run_phase(
+        host: str,
+        prefix: Path,
+        phase: Callable[[Path], None],
+        *inputs: object,
+    ) -> None:
+        """Run a processing phase on a prefix unless it is already up to date.
+
+        After a phase completes, a stamp with a hash of the phase name, its
+        inputs and the prefix mtime is saved to STAMPS_DIR. The phase is skipped
+        while the stamp matches, i.e. the prefix hasn't been rebuilt and the
+        relevant configuration hasn't changed.
+        """
+        name = phase.__name__.lstrip("_")
+        stamp = STAMPS_DIR / f"{host}.{name}"
+
+        def stamp_key() -> str:
+            data = json.dumps([name, prefix.stat().st_mtime_ns, inputs], default=str)
+            return hashlib.sha256(data.encode()).hexdigest()
+
+        if stamp.exists() and stamp.read_text() == stamp_key():
+            logger.info("Skipping %s for %s (already up to date).", name, host)
             return
 
-        logger.info("Downloading cacert.pem to: %s", cacert_path)
-        run(
-            "curl",
-            "-Lf",
-            "--retry",
-            "5",
-            "--retry-all-errors",
-            "-o",
-            cacert_path,
-            "https://curl.se/ca/cacert.pem",
-        )
+        phase(prefix)
 
-        self.config.include.append(cacert_path)
+        STAMPS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp.write_text(stamp_key())
+
+    def _include_cacert(self) -> None:
+        """Include the cacert.pem file in the module.
+
+        Python doesn't see system CA certificates (e.g. from
+        /system/etc/security/cacerts), so we should provide our own CA bundle
+        for SSL verification.
+        """
+        self.config.include.append(self.cacert[0])
 
     def _debloat(self, prefix: Path) -> None:
         """Remove unnecessary files and directories from the prefix."""
         logger.info("Debloating: %s", prefix)
 
-        patterns: list[str] = []
-        conditional_patterns: list[dict[str, str | list[str]]] = []
+        removals: list[Path] = []
 
-        for pattern in self.config.debloat_patterns:
-            if isinstance(pattern, str):
-                patterns.append(pattern)
-            else:
-                conditional_patterns.append(pattern)
+        for dirpath, dirnames, filenames in prefix.walk():
+            for name in (*dirnames, *filenames):
+                path = dirpath / name
+                relative_path = path.relative_to(prefix).as_posix()
 
-        for path in prefix.glob(patterns, flags=self.debloat_flags):
-            if path.is_dir() and not path.is_symlink():
-                shutil.rmtree(path)
-            else:
-                path.unlink()
+                # Like glob(), match directories (and symlinks to them) with a
+                # trailing slash, so that directory-only patterns ("lib/") work.
+                if name in dirnames or path.is_dir():
+                    relative_path += "/"
 
-            logger.info("  - Removed: %s", path.relative_to(prefix))
+                if self._should_debloat(path, relative_path):
+                    removals.append(path)
 
-        for pattern in conditional_patterns:
-            raw_pattern = pattern["pattern"]
-            rm_if = pattern["rm_if"]
+                    # No need to descend into a directory that will be removed.
+                    if name in dirnames:
+                        dirnames.remove(name)
 
-            rm_if = set(map(str.lower, rm_if))
+        self._remove_paths(prefix, removals)
 
-            rm_file = "file" in rm_if
-            rm_dir = "dir" in rm_if
-            rm_symlink = "symlink" in rm_if
+    def _should_debloat(self, path: Path, relative_path: str) -> bool:
+        """Check if a path in the prefix matches any of the debloat patterns."""
+        if self.debloat_matcher.match(relative_path):
+            return True
 
-            for path in prefix.glob(raw_pattern, flags=self.debloat_flags):
-                if (path.is_dir() and not path.is_symlink()) and rm_dir:
-                    shutil.rmtree(path)
-                elif (path.is_symlink() and rm_symlink) or (path.is_file() and rm_file):
-                    path.unlink()
-                else:
-                    continue
+        for matcher, rm_if in self.conditional_debloat_matchers:
+            if not matcher.match(relative_path):
+                continue
+
+            if (
+                ((path.is_dir() and not path.is_symlink()) and "dir" in rm_if)
+                or (path.is_symlink() and "symlink" in rm_if)
+                or (path.is_file() and "file" in rm_if)
+            ):
+                return True
+
+        return False
+
+    @staticmethod
+    def _remove_paths(prefix: Path, paths: list[Path]) -> None:
+        """Remove files and directories under the prefix concurrently.
 
-                logger.info("  - Removed: %s", path.relative_to(prefix))
+        Paths inside a directory that is removed as well are skipped, so no two
+        removals ever touch the same subtree.
+        """
+        top_level: list[Path] = []
+
+        # Sorting by path components puts every directory right before its
+        # contents.
+        for path in sorted(set(paths)):
+            if top_level and path.is_relative_to(top_level[-1]):
+                continue
+
+            top_level.append(path)
+
+        if not top_level:
+            return
+
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(remove_path, top_level))
+
+        logger.info(
+            "  - Removed %d paths:\n%s",
+            len(top_level),
+            "\n".join(f"      {path.relative_to(prefix)}" for path in top_level),
+        )
 
     def _fix_shebangs(self, prefix: Path) -> None:
         """Replace shebangs in scripts with Android-compatible paths.
@@ -442,27 +708,43 @@ class ModuleBuilder:
 
         logger.info("Fixing shebangs in: %s", prefix_bin)
 
-        for path in prefix_bin.iterdir():
-            if not path.is_file() or path.is_symlink():
-                continue
+        paths = [
+            path
+            for path in prefix_bin.iterdir()
+            if path.is_file() and not path.is_symlink()
+        ]
 
-            with path.open("rb") as fin:
-                content = fin.readline(1024)
-                if is_binary(content):
-                    continue
+        with ThreadPoolExecutor() as executor:
+            for path in executor.map(self._fix_one_shebang, paths):
+                if path is not None:
+                    logger.info("  - Patched: %s", path.relative_to(prefix))
 
-                if self.shell_shebang_re.match(content):
-                    new_shebang = self.shell_shebang
-                elif self.python_shebang_re.match(content):
-                    new_shebang = self.python_shebang
-                else:
-                    continue
+    def _fix_one_shebang(self, path: Path) -> Path | None:
+        """Replace the shebang of a single script.
 
-                content = new_shebang + fin.read()
+        Returns the path if the file was patched, None otherwise.
+        """
+        content = path.read_bytes()
+
+        # The first line, limited to 1024 bytes.
+        end = content.find(b"\n", 0, 1024)
+        first_line = content[: end + 1] if end != -1 else content[:1024]
+
+        if is_binary(first_line):
+            return None
+
+        # Already fixed shebangs (/system/bin/...) don't match and are skipped.
+        if (match := self.shebang_re.match(first_line)) is None:
+            return None
+
+        if match.group(1).startswith(b"python"):
+            new_shebang = self.python_shebang
+        else:
+            new_shebang = self.shell_shebang
 
-            path.write_bytes(content)
+        path.write_bytes(new_shebang + content[len(first_line) :])
 
-            logger.info("  - Patched: %s", path.relative_to(prefix))
+        return path
 
     def _strip(self, prefix: Path) -> None:
         """Remove debug symbols from binaries and libraries in the given prefix.
@@ -486,19 +768,38 @@ class ModuleBuilder:
             "lib/**/*.{so,a}",
         )
 
-        for path in prefix.glob(patterns, flags=BRACE | GLOBSTARLONG | NEGATE):
-            if not path.is_file() or path.is_symlink():
-                continue
+        files = [
+            path.relative_to(prefix)
+            for path in prefix.glob(patterns, flags=BRACE | GLOBSTARLONG | NEGATE)
+            if path.is_file() and not path.is_symlink() and is_object_file(path)
+        ]
 
-            run(
+        def strip(chunk: tuple[Path, ...]) -> None:
+            result = run(
                 llvm_strip,
                 *self.config.strip_args,
-                path.relative_to(prefix),
+                *chunk,
                 check=False,
                 cwd=prefix,
                 env=env,
             )
 
+            # llvm-strip gives up on the remaining files after the first failure,
+            # so retry them one at a time to strip as much as possible.
+            if result.returncode != 0 and len(chunk) > 1:
+                for path in chunk:
+                    run(
+                        llvm_strip,
+                        *self.config.strip_args,
+                        path,
+                        check=False,
+                        cwd=prefix,
+                        env=env,
+                    )
+
+        with ThreadPoolExecutor(os.cpu_count()) as executor:
+            list(executor.map(strip, batched(files, self.strip_batch_size)))
+
     def _compress(self, prefix: Path, host: str) -> Path:
         """Compress a prefix into a .tar.xz archive.
 
@@ -509,8 +810,20 @@ class ModuleBuilder:
         tarball_path = BUILD_DIR / self.compressed_name.format(magisk_arch)
         logger.info("Compressing %s to %s...", prefix, tarball_path)
 
-        with tarfile.open(tarball_path, "w:xz") as tar:
-            tar.add(prefix, prefix.name)
+        # GNU tar passes XZ_OPT to xz, so compression uses all CPU cores.
+        env = os.environ.copy()
+        env.setdefault("XZ_OPT", "-T0")
+
+        run(
+            "tar",
+            "-cJf",
+            tarball_path,
+            "-C",
+            prefix.parent,
+            prefix.name,
+            log=False,
+            env=env,
+        )
 
         return tarball_path
 
@@ -522,14 +835,20 @@ class ModuleBuilder:
         zip_path = DIST_DIR / self.config.name.substitute(props)
         logger.info("Packaging Magisk module: %s", zip_path)
 
-        with ZipFile(zip_path, "w") as zout:
+        # Scripts and text files are deflated, while the already compressed
+        # tarballs are stored as is.
+        with ZipFile(zip_path, "w", compression=ZIP_DEFLATED) as zout:
             logger.info("  - Writing module.prop")
             zout.writestr("module.prop", format_module_prop(props))
 
             for entry in (MODULE_DIR, *tarballs, *self.config.include):
                 if entry.is_file():
                     logger.info("  - Adding file: %s", entry)
-                    zout.write(entry, entry.name)
+                    zout.write(
+                        entry,
+                        entry.name,
+                        compress_type=ZIP_STORED if entry in tarballs else None,
+                    )
                     continue
 
                 logger.info("  - Adding directory: %s", entry)
@@ -542,7 +861,7 @@ class ModuleBuilder:
 
 def run(*command: str | Path, log: bool = True, **kwargs) -> CompletedProcess:
     """Run an external command with logging."""
-    if log:
+    if log and logger.isEnabledFor(logging.INFO):
         logger.info("> %s", shlex.join(map(str, command)))
 
     if "check" not in kwargs:
@@ -551,6 +870,43 @@ def run(*command: str | Path, log: bool = True, **kwargs) -> CompletedProcess:
     return subprocess.run(command, **kwargs)
 
 
+def _curl_supports_parallel() -> bool:
+    """Check whether curl supports the --parallel option (added in 7.66.0)."""
+    result = run("curl", "--version", capture_output=True, log=False, text=True)
+
+    if (match := re.match(r"curl (\d+)\.(\d+)", result.stdout)) is None:
+        return False
+
+    return tuple(map(int, match.groups())) >= (7, 66)
+
+
+def curl_quote(value: str) -> str:
+    """Quote a string for use in a curl config file."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def copy_tree(src: Path, dst: Path) -> None:
+    """Copy a directory tree, cloning file data where the filesystem allows.
+
+    On Linux this uses `cp --reflink=auto`, which is nearly free on
+    copy-on-write filesystems (btrfs, XFS) and falls back to a regular copy
+    elsewhere.
+    """
+    if sys.platform == "linux":
+        run("cp", "-a", "--reflink=auto", src, dst, log=False)
+    else:
+        shutil.copytree(src, dst, symlinks=True)
+
+
+def remove_path(path: Path) -> None:
+    """Remove a file, symlink, or directory tree."""
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
 def update_env_path(env: dict[str, str], key: str, *values: str | Path) -> None:
     """Prepend values to a path-like environment variable."""
     str_values = map(str, values)
@@ -563,34 +919,59 @@ def update_env_path(env: dict[str, str], key: str, *values: str | Path) -> None:
 
 def is_binary(data: bytes) -> bool:
     """Check if a bytes object appears to be binary data."""
-    return bool(data.translate(None, TEXT_CHARS))
+    return bool(data[:BINARY_CHECK_SIZE].translate(None, TEXT_CHARS))
 
 
-def parse_module_prop() -> dict[str, str]:
-    """Parse module.prop into a dictionary."""
-    module_prop = MODULE_DIR / "module.prop"
-    props = {}
+def is_object_file(path: Path) -> bool:
+    """Check if a file is an ELF object or a static library archive."""
+    with path.open("rb") as fin:
+        magic = fin.read(len(AR_MAGIC))
+
+    return magic.startswith((ELF_MAGIC, AR_MAGIC))
+
+
+def get_patched_files(patch: Path) -> set[str]:
+    """Return the files a unified diff touches, with the first component removed.
+
+    This matches the paths patch(1) operates on with -p1.
+    """
+    files: set[str] = set()
 
-    with module_prop.open(encoding="utf-8") as fin:
+    with patch.open(encoding="utf-8", errors="replace") as fin:
         for line in fin:
-            new_line = line.strip()
-            if new_line.startswith("#"):
+            if not line.startswith(("--- ", "+++ ")):
                 continue
 
-            parts = new_line.partition("=")
-            props[parts[0]] = parts[2]
+            path = line[4:].split("\t", 1)[0].strip()
+            if path != "/dev/null":
+                files.add(path.partition("/")[2])
 
-    return props
+    return files
 
 
-def format_module_prop(props: dict[str, str]) -> str:
-    """Convert a dictionary to the module.prop string format."""
-    buf = io.StringIO()
+def positive_int(value: str) -> int:
+    """Convert a command-line argument to a positive integer."""
+    number = int(value)
+
+    if number < 1:
+        error_msg = f"must be a positive integer: {value}"
+        raise ArgumentTypeError(error_msg)
+
+    return number
+
+
+def parse_module_prop() -> dict[str, str]:
+    """Parse module.prop into a dictionary."""
+    module_prop = MODULE_DIR / "module.prop"
+    lines = module_prop.read_text(encoding="utf-8").splitlines()
+    fields = (line.strip().partition("=") for line in lines)
 
-    for k, v in props.items():
-        buf.write(f"{k}={v}\n")
+    return {key: value for key, _, value in fields if key and not key.startswith("#")}
 
-    return buf.getvalue()
+
+def format_module_prop(props: dict[str, str]) -> str:
+    """Convert a dictionary to the module.prop string format."""
+    return "".join(f"{k}={v}\n" for k, v in props.items())
 
 
 def _prepare_environment() -> None:
@@ -599,10 +980,9 @@ def _prepare_environment() -> None:
         error_msg = "ANDROID_HOME environment variable is not set"
         raise BuilderError(error_msg)
 
-    for tool in REQUIRED_TOOLS:
-        if not shutil.which(tool):
-            error_msg = f"Required tool not found in PATH: {tool}"
-            raise BuilderError(error_msg)
+    if missing := [tool for tool in REQUIRED_TOOLS if not shutil.which(tool)]:
+        error_msg = f"Required tools not found in PATH: {', '.join(missing)}"
+        raise BuilderError(error_msg)
 
     if Path.cwd() != PROJECT_DIR:
         logger.warning("Changing working directory to project root: %s", PROJECT_DIR)
@@ -619,7 +999,7 @@ def _prepare_project_directory() -> None:
         error_msg = f"Build configuration file not found: {BUILD_CONFIG}"
         raise BuilderError(error_msg)
 
-    for path in (BUILD_DIR, DIST_DIR):
+    for path in (BUILD_DIR, DIST_DIR, SOURCE_CACHE_DIR):
         if not path.exists():
             path.mkdir(parents=True)
 
@@ -683,7 +1063,12 @@ def main() -> None:
         "-c",
         "--clean",
         action="store_true",
-        help="clean the build and dist directories",
+        help="clean the build and dist directories, keeping the source cache",
+    )
+    parser.add_argument(
+        "--clean-cache",
+        action="store_true",
+        help="clean the source cache (downloaded and extracted CPython sources)",
     )
     parser.add_argument(
         "-C",
@@ -692,6 +1077,14 @@ def main() -> None:
         default=BUILD_CONFIG,
         help="path to the configuration file",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        metavar="N",
+        help="number of hosts to build concurrently, derived from the CPU count "
+        "if not set",
+    )
 
     args = parser.parse_args()
 
@@ -699,16 +1092,29 @@ def main() -> None:
 
     if args.clean:
         for path in chain(BUILD_DIR.iterdir(), DIST_DIR.iterdir()):
-            if path.is_dir() and not path.is_symlink():
-                shutil.rmtree(path)
-            else:
-                path.unlink()
+            if path != SOURCE_CACHE_DIR:
+                remove_path(path)
 
         logger.info("Cleaned: %s, %s", BUILD_DIR, DIST_DIR)
 
+    if args.clean_cache:
+        for path in SOURCE_CACHE_DIR.iterdir():
+            remove_path(path)
+
+        logger.info("Cleaned: %s", SOURCE_CACHE_DIR)
+
     cpython_config, module_config = load_config(args.config)
+    if args.jobs is not None:
+        cpython_config = replace(cpython_config, jobs=args.jobs)
 
     cpython_builder = CPythonBuilder(cpython_config)
+
+    # Fetch everything the build needs up front in a single batch.
+    downloader = Downloader()
+    downloader.add(*cpython_builder.source_tarball)
+    downloader.add(*ModuleBuilder.cacert)
+    downloader.flush()
+
     build_result = cpython_builder.build()
 
     ModuleBuilder(
@@ -18,10 +18,12 @@ import re
 import shlex
 import shutil
 import subprocess
+import sys
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime
-from io import StringIO
 from pathlib import Path
-from subprocess import CompletedProcess
+from subprocess import CalledProcessError, CompletedProcess
 
 __version__ = "0.1.0"
 __author__ = "Mrakorez"
@@ -40,8 +42,15 @@ REQUIRED_TOOLS = ("git", "git-cliff")
 # Used for verification and updating version tags (e.g., "v0.2.0", "1.0.0").
 VERSION_TAG_RE = re.compile(r"v?\d+\.\d+\.\d+")
 
-# Used as the module's version code.
-VERSION_CODE_DATE = datetime.now(tz=UTC).strftime("%Y%m%d")
+# Used for finding the latest release in CHANGELOG (e.g., "## [0.3.5] - 2026-06-10").
+CHANGELOG_RELEASE_RE = re.compile(r"(?m)^## \[(v?\d+\.\d+\.\d+)\]")
+
+# Used for updating CPython version references in BUILD_TOML and README.
+BUILD_TOML_VERSION_RE = re.compile(r'(?<=version\s=\s")[^"]+')
+README_BADGE_RE = re.compile(r"(?<=badge/Python-)v?[\d.]+(?=-)")
+
+# Files holding a CPython version reference, paired with the pattern matching it.
+CPYTHON_REF_TARGETS = ((BUILD_TOML, BUILD_TOML_VERSION_RE), (README, README_BADGE_RE))
 
 logger = logging.getLogger(__name__)
 
@@ -50,127 +59,327 @@ class ReleaseError(Exception):
     """Raised for errors that occur during the release process."""
 
 
-def run(*command: str | Path, log: bool = True, **kwargs) -> CompletedProcess:
-    """Run an external command with logging."""
-    if log:
+def run(
+    *command: str | Path,
+    log: bool = True,
+    quiet: bool = False,
+    **kwargs,
+) -> CompletedProcess:
+    """Run an external command with logging.
+
+    With quiet set, stdout is discarded and stderr is only shown if the command
+    fails. It takes over the output handling, so it can't be combined with
+    stdout, stderr, capture_output or text=False.
+    """
+    if log and logger.isEnabledFor(logging.INFO):
         logger.info("> %s", shlex.join(map(str, command)))
 
     if "check" not in kwargs:
         kwargs["check"] = True
 
-    return subprocess.run(command, **kwargs)
+    if quiet:
+        conflicts = sorted(kwargs.keys() & {"stdout", "stderr", "capture_output"})
+        if not kwargs.get("text", True):
+            conflicts.append("text")
+        if conflicts:
+            error_msg = f"quiet can't be combined with: {', '.join(conflicts)}"
+            raise ValueError(error_msg)
+
+        kwargs.update(stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    try:
+        result = subprocess.run(command, **kwargs)
+    except CalledProcessError as e:
+        if quiet:
+            sys.stderr.write(e.stderr)
+        raise
+
+    if quiet and result.returncode != 0:
+        sys.stderr.write(result.stderr)
+
+    return result
+
+
+def commit_files(message: str, files: list[Path]) -> None:
+    """Commit the current contents of the given files.
+
+    Passing the paths to `git commit` stages and commits them in one process,
+    instead of a separate `git add`. Only tracked files can be committed this
+    way. The paths are sent NUL-separated on stdin, so the command line stays
+    short however many files there are.
+    """
+    logger.info("Committing: %s", ", ".join(map(str, files)))
+
+    run(
+        "git",
+        "commit",
+        "-m",
+        message,
+        "--pathspec-from-file=-",
+        "--pathspec-file-nul",
+        input="\0".join(map(str, files)),
+        quiet=True,
+        text=True,
+    )
+
 
+def version_code() -> str:
+    """Return the module's version code, which is the current UTC date."""
+    return datetime.now(tz=UTC).strftime("%Y%m%d")
 
-def _process_module_prop(tag: str) -> None:
-    """Process and update MODULE_PROP file with new version tag and code."""
-    props: dict[str, str] = {}
 
-    with MODULE_PROP.open() as fin:
-        for line in fin:
-            new_line = line.strip()
-            if new_line.startswith("#"):
-                continue
+def _process_module_prop(tag: str, code: str) -> None:
+    """Process and update MODULE_PROP file with new version tag and code.
 
-            fields = new_line.partition("=")
-            props[fields[0]] = fields[2]
+    Only the version and versionCode lines are rewritten, everything else
+    (including comments and blank lines) is kept as is.
+    """
+    # Lines are handled as bytes, so only the rewritten ones get decoded.
+    lines = MODULE_PROP.read_bytes().splitlines(keepends=True)
+    version_idx = code_idx = None
 
-    props["version"] = VERSION_TAG_RE.sub(tag, props["version"], count=1)
-    props["versionCode"] = VERSION_CODE_DATE
+    for i, line in enumerate(lines):
+        if line.startswith(b"#"):
+            continue
 
-    buf = StringIO()
-    for k, v in props.items():
-        buf.write(f"{k}={v}\n")
+        key = line.partition(b"=")[0].strip()
+        if key == b"version":
+            version_idx = i
+        elif key == b"versionCode":
+            code_idx = i
 
-    MODULE_PROP.write_text(buf.getvalue())
+    if version_idx is None or code_idx is None:
+        error_msg = f"Missing version or versionCode in {MODULE_PROP}"
+        raise ReleaseError(error_msg)
 
+    key, _, value = lines[version_idx].partition(b"=")
+    value = VERSION_TAG_RE.sub(tag, value.decode(), count=1).encode()
+    lines[version_idx] = key + b"=" + value
 
-def _process_update_json(tag: str) -> None:
+    key = lines[code_idx].partition(b"=")[0]
+    lines[code_idx] = key + b"=" + code.encode() + b"\n"
+
+    MODULE_PROP.write_bytes(b"".join(lines))
+
+
+def _process_update_json(tag: str, code: str) -> None:
     """Process and update UPDATE_JSON file with new version tag and code."""
-    with UPDATE_JSON.open() as fin:
-        data = json.load(fin)
+    data = json.loads(UPDATE_JSON.read_bytes())
 
-    data["version"] = VERSION_TAG_RE.sub(tag, data["version"])
-    data["versionCode"] = int(VERSION_CODE_DATE)
-    data["zipUrl"] = VERSION_TAG_RE.sub(tag, data["zipUrl"])
+    data["version"] = VERSION_TAG_RE.sub(tag, data["version"], count=1)
+    data["versionCode"] = int(code)
+    data["zipUrl"] = VERSION_TAG_RE.sub(tag, data["zipUrl"], count=1)
 
-    with UPDATE_JSON.open("w") as fin:
-        json.dump(data, fin, indent=4)
+    UPDATE_JSON.write_text(json.dumps(data, indent=4))
 
 
 def update_module(tag: str) -> list[Path]:
-    """Update module files (MODULE_PROP, UPDATE_JSON) with the given tag."""
-    _process_module_prop(tag)
-    _process_update_json(tag)
+    """Update module files (MODULE_PROP, UPDATE_JSON) with the given tag.
+
+    The files are independent, so they are rewritten concurrently. The version
+    code is taken once, so both files agree even across midnight.
+    """
+    code = version_code()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(fn, tag, code)
+            for fn in (_process_module_prop, _process_update_json)
+        ]
+        for future in futures:
+            future.result()
 
     return [MODULE_PROP, UPDATE_JSON]
 
 
-def generate_changelog(tag: str) -> list[Path]:
-    """Generate changelog using git-cliff."""
-    run("git-cliff", "-t", tag, "-o", CHANGELOG)
+def _latest_changelog_release() -> str | None:
+    """Return the version of the topmost release in CHANGELOG, if any."""
+    if not CHANGELOG.exists():
+        return None
+
+    if (match := CHANGELOG_RELEASE_RE.search(CHANGELOG.read_text())) is None:
+        return None
+
+    return match.group(1)
+
+
+def generate_changelog(tag: str, with_commits: Sequence[str] = ()) -> list[Path]:
+    """Generate changelog using git-cliff.
+
+    If CHANGELOG is up to date with the latest git tag, and that tag isn't the
+    one being released, only the unreleased commits are prepended to it,
+    instead of walking the whole history again.
+    Messages in with_commits are included as if they were already committed.
+    """
+    extra_args = [arg for message in with_commits for arg in ("--with-commit", message)]
+
+    result = run(
+        "git",
+        "describe",
+        "--tags",
+        "--abbrev=0",
+        capture_output=True,
+        check=False,
+        log=False,
+        text=True,
+    )
+    latest_tag = result.stdout.strip() if result.returncode == 0 else None
+    latest_release = _latest_changelog_release()
+
+    if (
+        latest_tag is not None
+        and latest_tag.lstrip("v") != tag.lstrip("v")
+        and latest_release is not None
+        and latest_tag.lstrip("v") == latest_release.lstrip("v")
+    ):
+        run(
+            "git-cliff",
+            "--unreleased",
+            "-t",
+            tag,
+            "--prepend",
+            CHANGELOG,
+            *extra_args,
+            quiet=True,
+        )
+    else:
+        run("git-cliff", "-t", tag, "-o", CHANGELOG, *extra_args, quiet=True)
 
     return [CHANGELOG]
 
 
-def update_cpython_refs(cpython_tag: str) -> list[Path]:
-    """Update CPython version references and set build version in README/BUILD_TOML."""
-    badge_re = re.compile(r"(?<=badge/Python-)v?[\d.]+(?=-)")
-    version_re = re.compile(r'(?<=version\s=\s")[^"]+')
+def _update_cpython_ref(cpython_tag: str, path: Path, pattern: re.Pattern) -> bool:
+    """Replace the CPython version reference in a file, if it differs.
+
+    Returns whether the file was changed.
+    """
+    content = path.read_text()
+
+    if (match := pattern.search(content)) is None:
+        error_msg = f"CPython version reference not found in {path}"
+        raise ReleaseError(error_msg)
+
+    if match.group() == cpython_tag:
+        return False
+
+    path.write_text(f"{content[: match.start()]}{cpython_tag}{content[match.end() :]}")
+    return True
 
-    for p, r in {BUILD_TOML: version_re, README: badge_re}.items():
-        content = p.read_text()
-        content = r.sub(cpython_tag, content, count=1)
-        p.write_text(content)
 
-    return [BUILD_TOML, README]
+def update_cpython_refs(
+    cpython_tag: str,
+    targets: Sequence[tuple[Path, re.Pattern]] = CPYTHON_REF_TARGETS,
+) -> list[Path]:
+    """Update CPython version references in the given files.
+
+    The files are independent, so they are rewritten concurrently. Returns only
+    the files that were changed, in the order of targets.
+    """
+    if not targets:
+        return []
+
+    workers = min(len(targets), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        changed = list(
+            executor.map(lambda t: _update_cpython_ref(cpython_tag, *t), targets),
+        )
+
+    return [
+        path for (path, _), updated in zip(targets, changed, strict=True) if updated
+    ]
 
 
 def prepare_release(tag: str, cpython_tag: str | None, *, commit: bool) -> None:
-    """Prepare the release by updating references, changelog, and module files."""
+    """Prepare the release by updating references, changelog, and module files.
+
+    A CPython bump is committed together with the release, using the bump as
+    the subject so that git-cliff (which skips release commits) still lists it.
+    """
+    files: list[Path] = []
+    bump_message = None
+
     if cpython_tag is not None:
         logger.info("Updating CPython version references...")
 
         files = update_cpython_refs(cpython_tag)
-        if commit:
-            run("git", "add", *files)
-            run("git", "commit", "-m", f"build(cpython): bump to {cpython_tag}")
-
-    files: list[Path] = []
+        if files:
+            bump_message = f"build(cpython): bump to {cpython_tag}"
+        else:
+            logger.info("CPython version references are already up to date.")
 
     logger.info("Preparing release...")
-    for fn in (update_module, generate_changelog):
-        files.extend(fn(tag))
+
+    # git-cliff takes far longer than the module file updates, so those are
+    # done in the background while it runs.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        module_files = executor.submit(update_module, tag)
+        changelog_files = generate_changelog(
+            tag,
+            [bump_message] if bump_message is not None else [],
+        )
+
+        files.extend((*module_files.result(), *changelog_files))
 
     if commit:
-        run("git", "add", *files)
-        run("git", "commit", "-m", f"chore(release): prepare for {tag}")
-        run("git", "tag", tag)
+        message = f"chore(release): prepare for {tag}"
+        if bump_message is not None:
+            message = f"{bump_message}\n\n{message}"
+
+        commit_files(message, files)
+        run("git", "tag", tag, quiet=True)
 
 
 def prepare_environment() -> None:
     """Check for required tools and sets the correct working directory."""
-    for tool in REQUIRED_TOOLS:
-        if shutil.which(tool) is None:
-            error_msg = f"Required tool not found in PATH: {tool}"
-            raise ReleaseError(error_msg)
+    if missing := [tool for tool in REQUIRED_TOOLS if shutil.which(tool) is None]:
+        error_msg = f"Required tools not found in PATH: {', '.join(missing)}"
+        raise ReleaseError(error_msg)
 
     if Path.cwd() != PROJECT_DIR:
         logger.warning("Changing working directory to project root: %s", PROJECT_DIR)
         os.chdir(PROJECT_DIR)
 
+    _check_git_clone()
+
+
+def _check_git_clone() -> None:
+    """Warn if the git clone is shallow, as git-cliff needs the full history."""
+    result = run(
+        "git",
+        "rev-parse",
+        "--is-shallow-repository",
+        capture_output=True,
+        check=False,
+        log=False,
+        text=True,
+    )
+
+    if result.stdout.strip() == "true":
+        logger.warning(
+            "Shallow clone detected, the changelog will miss older releases "
+            "(run `git fetch --unshallow` first)",
+        )
+
 
 def process_tag(tag: str) -> str:
-    """Ensure the tag starts with 'v'."""
-    return tag if tag.startswith("v") else "v" + tag
+    """Ensure the tag starts with 'v' and is a valid version tag."""
+    tag = tag if tag.startswith("v") else "v" + tag
+
+    if not VERSION_TAG_RE.fullmatch(tag):
+        error_msg = f"invalid version tag: {tag}"
+        raise argparse.ArgumentTypeError(error_msg)
+
+    return tag
 
 
 def main() -> None:
     """Run the main release automation pipeline."""
     parser = argparse.ArgumentParser()
-    parser.add_argument("tag", help="version tag for the module")
+    parser.add_argument("tag", type=process_tag, help="version tag for the module")
     parser.add_argument(
         "-c",
         "--cpython-tag",
+        type=process_tag,
         metavar="STR",
         help="optional CPython version tag to set for the build",
     )
@@ -190,16 +399,6 @@ def main() -> None:
 
     prepare_environment()
 
-    args.tag = process_tag(args.tag)
-    if args.cpython_tag is not None:
-        args.cpython_tag = process_tag(args.cpython_tag)
-
-    for tag in (args.tag, args.cpython_tag):
-        if tag is None:
-            continue
-        if not VERSION_TAG_RE.match(tag):
-            parser.error(f"invalid version tag: {tag}")
-
     prepare_release(args.tag, args.cpython_tag, commit=args.commit)
 
 